@@ -18,36 +18,125 @@ from __future__ import annotations
 
 from collections.abc import Sequence
 import dataclasses
-from typing import Any, ClassVar, Self, TypeVar
+import itertools
+import struct
+from typing import Any, ClassVar, Self, TypeVar, get_type_hints
 
 from bumble import hci
 
+_ADDRESS_FOLLOWED_BY_TYPE = struct.Struct("<6sB")
+# Fixed-size bumble field specs with a little-endian struct equivalent.
+_FIXED_FIELD_FORMATS: dict[int, str] = {
+    1: "B",
+    -1: "b",
+    2: "H",
+    -2: "h",
+    4: "I",
+}
+_MAX_FIXED_BYTES_FIELD_SIZE = 256
+
 
 def parse_address_followed_by_type(
     data: bytes, offset: int = 0
 ) -> tuple[int, hci.Address]:
-  return offset + 7, hci.Address(
-      data[offset : offset + 6], hci.AddressType(data[offset + 6])
+  address, address_type = _ADDRESS_FOLLOWED_BY_TYPE.unpack_from(data, offset)
+  return offset + _ADDRESS_FOLLOWED_BY_TYPE.size, hci.Address(
+      address, hci.AddressType(address_type)
   )
 
 
+def _fixed_field_format(field_type: Any) -> str | None:
+  """Returns the struct format of a fixed-size field spec, if it has one."""
+  if isinstance(field_type, dict):
+    if "size" in field_type:
+      field_type = field_type["size"]
+    elif "parser" in field_type:
+      field_type = field_type["parser"]
+  if not isinstance(field_type, int) or isinstance(field_type, bool):
+    return None
+  if 4 < field_type <= _MAX_FIXED_BYTES_FIELD_SIZE:
+    return f"{field_type}s"
+  return _FIXED_FIELD_FORMATS.get(field_type)
+
+
 @dataclasses.dataclass(frozen=True, kw_only=True)
 class _HciPacket(hci.HCI_Packet):
-  """Base extended HCI packet."""
+  """Base extended HCI packet.
+
+  Subclasses are dataclasses whose HCI fields are annotated with a bumble field
+  spec, e.g. `Annotated[int, 2]`. They must not be slotted: bumble formats
+  packets from the instance `__dict__`, and its base classes keep a `__dict__`
+  on every instance anyway.
+  """
 
   PARSE_OFFSET: ClassVar[int] = 0
+  _FIELD_SPECS: ClassVar[tuple[tuple[str, Any], ...] | None] = None
+  _PARSE_PLAN: ClassVar[tuple[tuple[tuple[str, ...], Any], ...] | None] = None
+
+  def __init_subclass__(cls, **kwargs: Any) -> None:
+    super().__init_subclass__(**kwargs)
+    # Dataclass fields are only available after the decorator has processed the
+    # class body, so specs are resolved lazily on first use.
+    cls._FIELD_SPECS = None
+    cls._PARSE_PLAN = None
+
+  @classmethod
+  def _field_specs(cls) -> tuple[tuple[str, Any], ...]:
+    """Returns (name, spec) pairs of HCI fields, cached per class."""
+    if (specs := cls._FIELD_SPECS) is None:
+      # Field types are strings in modules using postponed evaluation of
+      # annotations, so they have to be resolved to read the Annotated specs.
+      type_hints = get_type_hints(cls, include_extras=True)
+      specs = tuple(
+          (field.name, metadata[0])
+          for field in dataclasses.fields(cls)
+          if (metadata := getattr(type_hints[field.name], "__metadata__", None))
+      )
+      cls._FIELD_SPECS = specs
+    return specs
+
+  @classmethod
+  def _parse_plan(cls) -> tuple[tuple[tuple[str, ...], Any], ...]:
+    """Returns parsing steps of HCI fields, cached per class.
+
+    Each step is either a run of consecutive fixed-size fields with the
+    `struct.Struct` unpacking all of them at once, or a single field with its
+    bumble field spec.
+    """
+    if (plan := cls._PARSE_PLAN) is None:
+      steps: list[tuple[tuple[str, ...], Any]] = []
+      for is_fixed, group in itertools.groupby(
+          (
+              (field_name, field_type, _fixed_field_format(field_type))
+              for field_name, field_type in cls._field_specs()
+          ),
+          key=lambda spec: spec[2] is not None,
+      ):
+        specs = list(group)
+        if is_fixed:
+          field_names = tuple(field_name for field_name, _, _ in specs)
+          field_formats = "".join(fmt for _, _, fmt in specs if fmt)
+          steps.append((field_names, struct.Struct("<" + field_formats)))
+        else:
+          steps.extend(
+              ((field_name,), field_type) for field_name, field_type, _ in specs
+          )
+      plan = cls._PARSE_PLAN = tuple(steps)
+    return plan
 
   @classmethod
   def from_parameters(cls: type[Self], parameters: bytes) -> Self:
     """Creates an HCI packet from the given parameters."""
     offset = cls.PARSE_OFFSET
     values: dict[str, Any] = {}
-    for field in dataclasses.fields(cls):
-      if not (metadata := getattr(field.type, "__metadata__", None)):
-        continue
-      value, size = hci.HCI_Object.parse_field(parameters, offset, metadata[0])
-      offset += size
-      values[field.name] = value
+    for field_names, codec in cls._parse_plan():
+      if isinstance(codec, struct.Struct):
+        values.update(zip(field_names, codec.unpack_from(parameters, offset)))
+        offset += codec.size
+      else:
+        value, size = hci.HCI_Object.parse_field(parameters, offset, codec)
+        offset += size
+        values[field_names[0]] = value
     return cls(**values)
 
   @property
@@ -56,18 +145,14 @@ class _HciPacket(hci.HCI_Packet):
 
   @property
   def parameters(self) -> bytes:
-    return b"".join(
+    return b"".join([
         hci.HCI_Object.serialize_field(getattr(self, field_name), field_type)
-        for field_name, field_type in self.fields
-    )
+        for field_name, field_type in self._field_specs()
+    ])
 
   @property
-  def fields(self) -> list[tuple[str, Any]]:
-    return [
-        (field.name, field.type.__metadata__[0])
-        for field in dataclasses.fields(self)
-        if hasattr(field.type, "__metadata__")
-    ]
+  def fields(self) -> Sequence[tuple[str, Any]]:
+    return self._field_specs()
 
 
 class Command(_HciPacket, hci.HCI_Command):
@@ -111,18 +196,48 @@ class LeMetaEvent(_HciPacket, hci.HCI_LE_Meta_Event):
 
 
 class VendorEvent(_HciPacket, hci.HCI_Vendor_Event):
-  """Base extended HCI Vendor Event."""
+  """Base extended HCI Vendor Event.
+
+  Subclasses declaring a `subevent_code` are registered automatically and
+  dispatched by a single dictionary lookup on the first parameter byte. Other
+  subclasses must be registered with `VendorEvent.register`.
+  """
 
   PARSE_OFFSET = 1
 
+  subevent_code: int
+
+  def __init_subclass__(cls, **kwargs: Any) -> None:
+    super().__init_subclass__(**kwargs)
+    if "subevent_code" in cls.__dict__:
+      registered = _VENDOR_EVENT_CLASSES.get(cls.subevent_code)
+      if registered is not None and registered is not cls:
+        raise ValueError(
+            f"Vendor subevent code 0x{cls.subevent_code:02X} of"
+            f" {cls.__name__} is already registered by {registered.__name__}"
+        )
+      if not _VENDOR_EVENT_CLASSES:
+        hci.HCI_Event.add_vendor_factory(_vendor_event_from_parameters)
+      _VENDOR_EVENT_CLASSES[cls.subevent_code] = cls
+
   @classmethod
   def register(cls: type[Self], clazz: type[_VE]) -> type[_VE]:
     """Registers the VendorEvent with the HCI module."""
 
-    hci.HCI_Event.add_vendor_factory(clazz.from_parameters)
+    if "subevent_code" not in clazz.__dict__:
+      hci.HCI_Event.add_vendor_factory(clazz.from_parameters)
     return clazz
 
 
+_VENDOR_EVENT_CLASSES: dict[int, type[VendorEvent]] = {}
+
+
+def _vendor_event_from_parameters(parameters: bytes) -> VendorEvent | None:
+  if parameters and (clazz := _VENDOR_EVENT_CLASSES.get(parameters[0])):
+    return clazz.from_parameters(parameters)
+  return None
+
+
 _C = TypeVar("_C", bound=Command)
 _VE = TypeVar("_VE", bound=VendorEvent)
 _LEME = TypeVar("_LEME", bound=LeMetaEvent)
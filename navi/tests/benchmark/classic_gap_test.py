@@ -31,10 +31,10 @@ from navi.utils import bl4a_api
 from navi.utils import constants
 
 
-_TERMINATED_BOND_STATES = (
+_TERMINATED_BOND_STATES = frozenset((
     android_constants.BondState.BONDED,
     android_constants.BondState.NONE,
-)
+))
 _MAJOR_CASE_DEFAULT_REPEAT_TIMES = 50
 _MINOR_CASE_DEFAULT_REPEAT_TIMES = 5
 _DEFAULT_REPEAT_TIMES = 50
@@ -27,10 +27,10 @@ from navi.utils import android_constants
 from navi.utils import bl4a_api
 
 
-_TERMINATED_BOND_STATES = (
+_TERMINATED_BOND_STATES = frozenset((
     android_constants.BondState.BONDED,
     android_constants.BondState.NONE,
-)
+))
 _DEFAULT_STEP_TIMEOUT_SECONDS = 10.0
 _PIN_CODE_DEFAULT = '834701'
 
@@ -18,6 +18,7 @@ import asyncio
 from collections.abc import Callable
 import contextlib
 import enum
+import functools
 import itertools
 from typing import Any
 import uuid
@@ -40,10 +41,10 @@ from navi.utils import retry
 # Somehow this rule has some issues.
 # pylint: disable=redundant-match
 
-_TERMINATED_BOND_STATES = (
+_TERMINATED_BOND_STATES = frozenset((
     android_constants.BondState.BONDED,
     android_constants.BondState.NONE,
-)
+))
 _DEFAULT_STEP_TIMEOUT_SECONDS = 15.0
 
 
@@ -62,31 +63,121 @@ _AndroidPairingVariant = android_constants.PairingVariant
 _BumblePairingVariant = pairing_utils.PairingVariant
 _DEFAULT_SETUP_TIMEOUT_SECONDS = 15.0
 
+_SECURE_PAIRING_PARAMS = tuple(
+    (
+        variant,
+        connection_direction,
+        pairing_direction,
+        ref_io_capability,
+        ref_connection_address_type,
+        smp_key_distribution,
+    )
+    for (
+        variant,
+        connection_direction,
+        pairing_direction,
+        ref_io_capability,
+        ref_connection_address_type,
+        smp_key_distribution,
+    ) in itertools.product(
+        list(TestVariant),
+        list(_Direction),
+        list(_Direction),
+        (
+            pairing.PairingDelegate.NO_OUTPUT_NO_INPUT,
+            pairing.PairingDelegate.DISPLAY_OUTPUT_AND_YES_NO_INPUT,
+        ),
+        (_AddressType.RANDOM, _AddressType.PUBLIC),
+        (
+            # IRK + LTK
+            _KeyDistribution.DISTRIBUTE_ENCRYPTION_KEY
+            | _KeyDistribution.DISTRIBUTE_IDENTITY_KEY,
+            # IRK + LTK + LK (CTKD)
+            _KeyDistribution.DISTRIBUTE_ENCRYPTION_KEY
+            | _KeyDistribution.DISTRIBUTE_IDENTITY_KEY
+            | _KeyDistribution.DISTRIBUTE_LINK_KEY,
+        ),
+    )
+    # Android cannot send SMP_Security_Request.
+    if connection_direction != _Direction.INCOMING
+    or pairing_direction != _Direction.OUTGOING
+)
+
+_LEGACY_PAIRING_PARAMS = tuple(
+    (
+        variant,
+        connection_direction,
+        pairing_direction,
+        ref_io_capability,
+    )
+    for (
+        variant,
+        connection_direction,
+        pairing_direction,
+        ref_io_capability,
+    ) in itertools.product(
+        list(TestVariant),
+        list(_Direction),
+        list(_Direction),
+        (
+            pairing.PairingDelegate.NO_OUTPUT_NO_INPUT,
+            pairing.PairingDelegate.DISPLAY_OUTPUT_AND_YES_NO_INPUT,
+            pairing.PairingDelegate.DISPLAY_OUTPUT_AND_KEYBOARD_INPUT,
+            pairing.PairingDelegate.DISPLAY_OUTPUT_ONLY,
+            pairing.PairingDelegate.KEYBOARD_INPUT_ONLY,
+        ),
+    )
+    # Android cannot send SMP_Security_Request.
+    if connection_direction != _Direction.INCOMING
+    or pairing_direction != _Direction.OUTGOING
+)
+
+
+def _is_bond_terminated(event: bl4a_api.BondStateChanged) -> bool:
+  return event.state in _TERMINATED_BOND_STATES
+
+
+def _make_pairing_config(
+    delegate: pairing.PairingDelegate,
+    _: device.Connection,
+    *,
+    sc: bool,
+) -> pairing.PairingConfig:
+  return pairing.PairingConfig(
+      sc=sc,
+      mitm=True,
+      bonding=True,
+      identity_address_type=pairing.PairingConfig.AddressType.PUBLIC,
+      delegate=delegate,
+  )
+
 
 class LePairingTest(navi_test_base.TwoDevicesTestBase):
 
   @retry.retry_on_exception()
   async def _make_outgoing_connection(
-      self, ref_connection_address_type: _AddressType, create_bond: bool
+      self,
+      ref_connection_address_type: _AddressType,
+      create_bond: bool,
+      ref_addr: str | None = None,
   ) -> device.Connection:
-    ref_addr = str(
-        self.ref.random_address
-        if ref_connection_address_type == _AddressType.RANDOM
-        else self.ref.address
-    )
+    if ref_addr is None:
+      ref_addr = str(
+          self.ref.random_address
+          if ref_connection_address_type == _AddressType.RANDOM
+          else self.ref.address
+      )
     self.logger.info('[REF] Start advertising.')
     await self.ref.device.start_advertising(
         own_address_type=ref_connection_address_type
     )
 
-    with pyee_extensions.EventWatcher() as watcher:
-      ref_dut_connection_future = asyncio.get_running_loop().create_future()
-
-      @watcher.on(self.ref.device, 'connection')
-      def _(connection: device.Connection) -> None:
-        if connection.transport == core.BT_LE_TRANSPORT:
-          ref_dut_connection_future.set_result(connection)
-
+    ref_dut_connection_future = pyee_extensions.first_event(
+        self.ref.device,
+        'connection',
+        lambda connection: connection.transport == core.BT_LE_TRANSPORT,
+    )
+    try:
       self.logger.info('[DUT] Connect to REF.')
       if create_bond:
         self.assertTrue(
@@ -106,9 +197,11 @@ class LePairingTest(navi_test_base.TwoDevicesTestBase):
 
       async with self.assert_not_timeout(_DEFAULT_STEP_TIMEOUT_SECONDS):
         ref_dut_connection = await ref_dut_connection_future
+    finally:
+      ref_dut_connection_future.cancel()
 
-      await self.ref.device.stop_advertising()
-      return ref_dut_connection
+    await self.ref.device.stop_advertising()
+    return ref_dut_connection
 
   @retry.retry_on_exception()
   async def _make_incoming_connection(
@@ -129,13 +222,18 @@ class LePairingTest(navi_test_base.TwoDevicesTestBase):
 
     self.logger.info('[REF] Scan for DUT.')
     scan_result = asyncio.get_running_loop().create_future()
+    # Compare against a parsed UUID, since comparing UUID with str parses the
+    # string again for every advertising report.
+    expected_service_uuid = core.UUID(service_uuid)
     with advertise, pyee_extensions.EventWatcher() as watcher:
 
       def on_advertising_report(adv: device.Advertisement) -> None:
+        if scan_result.done():
+          return
         if service_uuids := adv.data.get(
             core.AdvertisingData.Type.COMPLETE_LIST_OF_128_BIT_SERVICE_CLASS_UUIDS
         ):
-          if service_uuid in service_uuids and not scan_result.done():
+          if expected_service_uuid in service_uuids:
             scan_result.set_result(adv.address)
 
       watcher.on(self.ref.device, 'advertisement', on_advertising_report)
@@ -159,47 +257,7 @@ class LePairingTest(navi_test_base.TwoDevicesTestBase):
 
     return ref_dut_connection
 
-  @navi_test_base.parameterized(*(
-      (
-          variant,
-          connection_direction,
-          pairing_direction,
-          ref_io_capability,
-          ref_connection_address_type,
-          smp_key_distribution,
-      )
-      for (
-          variant,
-          connection_direction,
-          pairing_direction,
-          ref_io_capability,
-          ref_connection_address_type,
-          smp_key_distribution,
-      ) in itertools.product(
-          list(TestVariant),
-          list(_Direction),
-          list(_Direction),
-          (
-              pairing.PairingDelegate.NO_OUTPUT_NO_INPUT,
-              pairing.PairingDelegate.DISPLAY_OUTPUT_AND_YES_NO_INPUT,
-          ),
-          (_AddressType.RANDOM, _AddressType.PUBLIC),
-          (
-              # IRK + LTK
-              _KeyDistribution.DISTRIBUTE_ENCRYPTION_KEY
-              | _KeyDistribution.DISTRIBUTE_IDENTITY_KEY,
-              # IRK + LTK + LK (CTKD)
-              _KeyDistribution.DISTRIBUTE_ENCRYPTION_KEY
-              | _KeyDistribution.DISTRIBUTE_IDENTITY_KEY
-              | _KeyDistribution.DISTRIBUTE_LINK_KEY,
-          ),
-      )
-      # Android cannot send SMP_Security_Request.
-      if not (
-          connection_direction == _Direction.INCOMING
-          and pairing_direction == _Direction.OUTGOING
-      )
-  ))
+  @navi_test_base.parameterized(*_SECURE_PAIRING_PARAMS)
   @navi_test_base.retry(max_count=2)
   async def test_secure_pairing(
       self,
@@ -235,6 +293,15 @@ class LePairingTest(navi_test_base.TwoDevicesTestBase):
     # Setup stage
     # #######################
 
+    ref_addr = str(
+        self.ref.random_address
+        if ref_connection_address_type == _AddressType.RANDOM
+        else self.ref.address
+    ).upper()
+
+    def is_from_ref(event: bl4a_api.PairingRequest) -> bool:
+      return event.address == ref_addr
+
     pairing_delegate = pairing_utils.PairingDelegate(
         auto_accept=True,
         io_capability=ref_io_capability,
@@ -242,26 +309,12 @@ class LePairingTest(navi_test_base.TwoDevicesTestBase):
         local_responder_key_distribution=smp_key_distribution,
     )
 
-    def pairing_config_factory(
-        _: device.Connection,
-    ) -> pairing.PairingConfig:
-      return pairing.PairingConfig(
-          sc=True,
-          mitm=True,
-          bonding=True,
-          identity_address_type=pairing.PairingConfig.AddressType.PUBLIC,
-          delegate=pairing_delegate,
-      )
-
-    self.ref.device.pairing_config_factory = pairing_config_factory
+    self.ref.device.pairing_config_factory = functools.partial(
+        _make_pairing_config, pairing_delegate, sc=True
+    )
 
     dut_cb = self.dut.bl4a.register_callback(bl4a_api.Module.ADAPTER)
     self.test_case_context.push(dut_cb)
-    ref_addr = str(
-        self.ref.random_address
-        if ref_connection_address_type == _AddressType.RANDOM
-        else self.ref.address
-    ).upper()
 
     need_double_confirmation = (
         connection_direction == _Direction.OUTGOING
@@ -277,14 +330,14 @@ class LePairingTest(navi_test_base.TwoDevicesTestBase):
     if connection_direction == _Direction.OUTGOING:
       if pairing_direction == _Direction.INCOMING:
         ref_dut = await self._make_outgoing_connection(
-            ref_connection_address_type, create_bond=False
+            ref_connection_address_type, create_bond=False, ref_addr=ref_addr
         )
         self.logger.info('[REF] Request pairing.')
         ref_dut.request_pairing()
       else:
         self.logger.info('[DUT] Start pairing.')
         ref_dut = await self._make_outgoing_connection(
-            ref_connection_address_type, create_bond=True
+            ref_connection_address_type, create_bond=True, ref_addr=ref_addr
         )
         # Clean all bond state events since there might be some events produced
         # by retries.
@@ -311,7 +364,7 @@ class LePairingTest(navi_test_base.TwoDevicesTestBase):
     self.logger.info('[DUT] Wait for pairing request.')
     dut_pairing_event = await dut_cb.wait_for_event(
         bl4a_api.PairingRequest,
-        lambda e: (e.address == ref_addr),
+        is_from_ref,
         timeout=_DEFAULT_SETUP_TIMEOUT_SECONDS,
     )
 
@@ -321,7 +374,7 @@ class LePairingTest(navi_test_base.TwoDevicesTestBase):
       self.logger.info('[DUT] Wait for 2nd pairing request.')
       dut_pairing_event = await dut_cb.wait_for_event(
           bl4a_api.PairingRequest,
-          lambda e: (e.address == ref_addr),
+          is_from_ref,
           timeout=_DEFAULT_SETUP_TIMEOUT_SECONDS,
       )
 
@@ -376,7 +429,7 @@ class LePairingTest(navi_test_base.TwoDevicesTestBase):
     actual_state = (
         await dut_cb.wait_for_event(
             bl4a_api.BondStateChanged,
-            lambda e: (e.state in _TERMINATED_BOND_STATES),
+            _is_bond_terminated,
             timeout=_DEFAULT_SETUP_TIMEOUT_SECONDS,
         )
     ).state
@@ -395,36 +448,7 @@ class LePairingTest(navi_test_base.TwoDevicesTestBase):
       with contextlib.suppress(*expected_errors):
         await pair_task
 
-  @navi_test_base.parameterized(*(
-      (
-          variant,
-          connection_direction,
-          pairing_direction,
-          ref_io_capability,
-      )
-      for (
-          variant,
-          connection_direction,
-          pairing_direction,
-          ref_io_capability,
-      ) in itertools.product(
-          list(TestVariant),
-          list(_Direction),
-          list(_Direction),
-          (
-              pairing.PairingDelegate.NO_OUTPUT_NO_INPUT,
-              pairing.PairingDelegate.DISPLAY_OUTPUT_AND_YES_NO_INPUT,
-              pairing.PairingDelegate.DISPLAY_OUTPUT_AND_KEYBOARD_INPUT,
-              pairing.PairingDelegate.DISPLAY_OUTPUT_ONLY,
-              pairing.PairingDelegate.KEYBOARD_INPUT_ONLY,
-          ),
-      )
-      # Android cannot send SMP_Security_Request.
-      if not (
-          connection_direction == _Direction.INCOMING
-          and pairing_direction == _Direction.OUTGOING
-      )
-  ))
+  @navi_test_base.parameterized(*_LEGACY_PAIRING_PARAMS)
   @navi_test_base.retry(max_count=2)
   async def test_legacy_pairing(
       self,
@@ -460,21 +484,17 @@ class LePairingTest(navi_test_base.TwoDevicesTestBase):
         local_responder_key_distribution=pairing.PairingDelegate.DEFAULT_KEY_DISTRIBUTION,
     )
 
-    def pairing_config_factory(_: device.Connection) -> pairing.PairingConfig:
-      return pairing.PairingConfig(
-          sc=False,
-          mitm=True,
-          bonding=True,
-          identity_address_type=pairing.PairingConfig.AddressType.PUBLIC,
-          delegate=pairing_delegate,
-      )
-
-    self.ref.device.pairing_config_factory = pairing_config_factory
+    self.ref.device.pairing_config_factory = functools.partial(
+        _make_pairing_config, pairing_delegate, sc=False
+    )
 
     dut_cb = self.dut.bl4a.register_callback(bl4a_api.Module.ADAPTER)
     self.test_case_context.push(dut_cb)
     ref_addr = self.ref.random_address
 
+    def is_from_ref(event: bl4a_api.PairingRequest) -> bool:
+      return event.address == ref_addr
+
     need_double_confirmation = (
         connection_direction == _Direction.OUTGOING
         and pairing_direction == _Direction.INCOMING
@@ -515,7 +535,7 @@ class LePairingTest(navi_test_base.TwoDevicesTestBase):
     self.logger.info('[DUT] Wait for pairing request.')
     dut_pairing_event = await dut_cb.wait_for_event(
         bl4a_api.PairingRequest,
-        lambda e: (e.address == ref_addr),
+        is_from_ref,
         timeout=_DEFAULT_SETUP_TIMEOUT_SECONDS,
     )
 
@@ -525,7 +545,7 @@ class LePairingTest(navi_test_base.TwoDevicesTestBase):
       self.logger.info('[DUT] Wait for 2nd pairing request.')
       dut_pairing_event = await dut_cb.wait_for_event(
           bl4a_api.PairingRequest,
-          lambda e: (e.address == ref_addr),
+          is_from_ref,
           timeout=_DEFAULT_SETUP_TIMEOUT_SECONDS,
       )
 
@@ -612,7 +632,7 @@ class LePairingTest(navi_test_base.TwoDevicesTestBase):
     )
     bond_state_changed_event = await dut_cb.wait_for_event(
         bl4a_api.BondStateChanged,
-        lambda e: (e.state in _TERMINATED_BOND_STATES),
+        _is_bond_terminated,
         timeout=_DEFAULT_SETUP_TIMEOUT_SECONDS,
     )
     self.assertEqual(bond_state_changed_event.state, expect_state)
@@ -14,7 +14,6 @@
 
 """Generic functionality test suite for Bluetooth."""
 
-import inspect
 import pkgutil
 import importlib
 from mobly import base_test
@@ -24,17 +23,24 @@ from navi.tests import smoke
 from navi.tests import functionality
 
 def main() -> None:
-    test_classes: list[base_test.BaseTestClass] = []
-    for module in (smoke, functionality):
+    test_classes: list[type[base_test.BaseTestClass]] = []
+    seen: set[type[base_test.BaseTestClass]] = set()
+    submodule_names = [
+        submodule_info.name
+        for module in (smoke, functionality)
         for submodule_info in pkgutil.iter_modules(
             module.__path__, prefix=module.__name__ + "."
-        ):
-            submodule = importlib.import_module(submodule_info.name)
-            for _, test_class in inspect.getmembers(
-                submodule,
-                lambda x: inspect.isclass(x)
-                and issubclass(x, base_test.BaseTestClass),
+        )
+    ]
+    for submodule in map(importlib.import_module, submodule_names):
+        for test_class in vars(submodule).values():
+            if (
+                isinstance(test_class, type)
+                and issubclass(test_class, base_test.BaseTestClass)
+                and test_class is not base_test.BaseTestClass
+                and test_class not in seen
             ):
+                seen.add(test_class)
                 test_classes.append(test_class)
     suite_runner.run_suite(test_classes)
 
@@ -26,6 +26,8 @@ from navi.utils import android_constants
 from navi.utils import bl4a_api
 from navi.utils import pyee_extensions
 
+_DEFAULT_STEP_TIMEOUT_SECONDS = 15.0
+
 
 class ClassicHostTest(navi_test_base.TwoDevicesTestBase):
 
@@ -44,7 +46,7 @@ class ClassicHostTest(navi_test_base.TwoDevicesTestBase):
 
       await self.ref.device.accept(
           f'{self.dut.address}/P',
-          timeout=datetime.timedelta(seconds=15).total_seconds(),
+          timeout=_DEFAULT_STEP_TIMEOUT_SECONDS,
       )
       await dut_cb.wait_for_event(
           bl4a_api.AclConnected(
@@ -132,7 +134,7 @@ class ClassicHostTest(navi_test_base.TwoDevicesTestBase):
 
       await self.ref.device.start_discovery()
       await asyncio.tasks.wait_for(
-          inquiry_future, timeout=datetime.timedelta(seconds=15).total_seconds()
+          inquiry_future, timeout=_DEFAULT_STEP_TIMEOUT_SECONDS
       )
 
   async def test_not_discoverable(self) -> None:
@@ -158,7 +160,7 @@ class ClassicHostTest(navi_test_base.TwoDevicesTestBase):
       with contextlib.suppress(asyncio.exceptions.TimeoutError):
         await asyncio.tasks.wait_for(
             inquiry_future,
-            timeout=datetime.timedelta(seconds=15).total_seconds(),
+            timeout=_DEFAULT_STEP_TIMEOUT_SECONDS,
         )
         asserts.assert_is_none(inquiry_future.result())
 
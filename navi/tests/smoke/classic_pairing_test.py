@@ -38,10 +38,10 @@ from navi.utils import constants
 from navi.utils import pyee_extensions
 
 
-_TERMINATED_BOND_STATES = (
+_TERMINATED_BOND_STATES = frozenset((
     android_constants.BondState.BONDED,
     android_constants.BondState.NONE,
-)
+))
 _DEFAULT_STEP_TIMEOUT = datetime.timedelta(seconds=10)
 _DEFAULT_STEP_TIMEOUT_SECONDS = _DEFAULT_STEP_TIMEOUT.total_seconds()
 _COD_DEFAULT = 0x1F00
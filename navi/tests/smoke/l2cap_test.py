@@ -13,7 +13,6 @@
 #  limitations under the License.
 
 import asyncio
-import datetime
 import enum
 
 from bumble import core
@@ -36,6 +35,7 @@ class Variant(enum.Enum):
 
 _PairingDelegate = pairing.PairingDelegate
 _DEFAULT_TIMEOUT_SECONDS = 5.0
+_CONNECTION_TIMEOUT_SECONDS = 15.0
 _TEST_DATA = bytes(i % 256 for i in range(10000))
 
 
@@ -135,7 +135,7 @@ class L2capTest(navi_test_base.TwoDevicesTestBase):
     ref_dut_acl = await self.ref.device.connect(
         f"{self.dut.address}/P",
         transport=core.BT_LE_TRANSPORT,
-        timeout=datetime.timedelta(seconds=15).total_seconds(),
+        timeout=_CONNECTION_TIMEOUT_SECONDS,
         own_address_type=hci.OwnAddressType.RANDOM,
     )
 
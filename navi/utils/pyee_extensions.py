@@ -69,6 +69,42 @@ class EventWatcher(bumble.utils.EventWatcher):
     return queue
 
 
+def first_event(
+    emitter: pyee.EventEmitter,
+    event: str,
+    predicate: Callable[..., bool] | None = None,
+) -> asyncio.Future[Any]:
+  """Returns a future resolved by the first expected event.
+
+  Only one listener is attached, and it is removed from the emitter once the
+  returned future is done or cancelled.
+
+  Args:
+    emitter: Event emitter.
+    event: Name of event.
+    predicate: Function determining whether an event is expected. If not
+      passed, the first event will be taken.
+
+  Returns:
+    A future resolved with the first argument of the expected event.
+  """
+  future = asyncio.get_running_loop().create_future()
+
+  def handler(*args, **kwargs) -> None:
+    if future.done():
+      return
+    if predicate is None or predicate(*args, **kwargs):
+      future.set_result(args[0] if args else None)
+
+  def remove_handler(_: asyncio.Future[Any]) -> None:
+    if handler in emitter.listeners(event):
+      emitter.remove_listener(event, handler)
+
+  emitter.on(event, handler)
+  future.add_done_callback(remove_handler)
+  return future
+
+
 _T = TypeVar("_T")
 
 